@@ -3,23 +3,104 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+import functools
+import hashlib
+import re
 import time
-from typing import Dict, Any, Optional
+from collections import Counter
+from itertools import islice
+from typing import Dict, Any, List, Optional
 import uuid
+from cachetools import Cache, TTLCache
 from app.utils.auth import verify_token, get_user
 from app.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Rate limiter setup
-limiter = Limiter(key_func=get_remote_address)
+def get_rate_limit_key(request: Request) -> str:
+    """
+    Get the rate limit key for a request.
+    
+    Authenticated users are limited per username, so users sharing an IP
+    (NAT, proxies) don't share a bucket. Only tokens already verified by
+    get_current_user count; anything else falls back to the client IP.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        cached_user = _token_cache.get(_hash_token(token))
+        if cached_user is not None:
+            return f"user:{cached_user['username']}"
+    
+    return get_remote_address(request)
+
+# Rate limiter setup (Redis-backed when configured so limits hold across workers)
+limiter = Limiter(
+    key_func=get_rate_limit_key,
+    storage_uri=settings.REDIS_URL or "memory://",
+    strategy="moving-window"
+)
 
 # Security scheme
 security = HTTPBearer(auto_error=False)
 
-# In-memory session store
-session_store: Dict[str, Dict[str, Any]] = {}
+# Short-lived cache of verified tokens, keyed by a truncated SHA-256 digest of the token
+_token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.TOKEN_CACHE_TTL)
+
+def _hash_token(token: str) -> bytes:
+    """Get the token cache key for a bearer token."""
+    return hashlib.sha256(token.encode()).digest()[:16]
+
+class SessionStore(TTLCache):
+    """TTL-bounded session store that keeps guest/authenticated counts up to date."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.guest_count = 0
+        self.auth_count = 0
+
+    def _track(self, session_data: Dict[str, Any], delta: int):
+        if session_data.get("is_guest", True):
+            self.guest_count += delta
+        else:
+            self.auth_count += delta
+
+    def __setitem__(self, key, value):
+        is_new = key not in self
+        super().__setitem__(key, value)
+        if is_new:
+            self._track(value, 1)
+
+    def __delitem__(self, key):
+        # Read through Cache so entries past their TTL are still counted
+        session_data = Cache.__getitem__(self, key)
+        super().__delitem__(key)
+        self._track(session_data, -1)
+
+    def expire(self, time=None):
+        # TTLCache.expire bypasses __delitem__, so account for evictions here
+        expired = super().expire(time)
+        for _, session_data in expired:
+            self._track(session_data, -1)
+        return expired
+
+# Valid sector names: 2-50 lowercase letters, numbers, spaces, hyphens or underscores
+_SECTOR_RE = re.compile(r'^[a-z0-9\s\-_]{2,50}$')
+
+# Known sectors (you can expand this)
+_VALID_SECTORS = frozenset({
+    "pharmaceuticals", "technology", "agriculture", "automotive", "banking", 
+    "healthcare", "energy", "telecommunications", "retail", "manufacturing",
+    "textiles", "chemicals", "steel", "cement", "real estate", "education",
+    "hospitality", "logistics", "aviation", "railways", "defense", "space",
+    "renewable energy", "fintech", "biotech", "mining", "oil gas", "food processing"
+})
+
+# In-memory session store (bounded by size and TTL)
+session_store = SessionStore(maxsize=settings.SESSION_MAX_SIZE, ttl=settings.SESSION_TTL)
+
+# Request counts not yet applied to session_store (see flush_session_updates)
+_pending_requests: Counter = Counter()
 
 def get_rate_limiter():
     """Get rate limiter instance."""
@@ -39,6 +120,11 @@ async def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] =
         # Allow guest access
         return {"username": "guest", "is_guest": True}
     
+    token_hash = _hash_token(credentials.credentials)
+    cached_user = _token_cache.get(token_hash)
+    if cached_user is not None:
+        return dict(cached_user)
+    
     try:
         # Verify token
         payload = verify_token(credentials.credentials)
@@ -64,12 +150,19 @@ async def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] =
                 detail="Inactive user"
             )
         
-        return {
+        user_info = {
             "username": user["username"],
             "is_guest": False,
             "authenticated": True
         }
         
+        # Only cache tokens that stay valid for the whole cache TTL
+        expires_at = payload.get("exp")
+        if expires_at is None or expires_at - time.time() >= settings.TOKEN_CACHE_TTL:
+            _token_cache[token_hash] = user_info
+        
+        return dict(user_info)
+        
     except HTTPException:
         raise
     except Exception as e:
@@ -94,24 +187,47 @@ async def get_user_session(request: Request, current_user: Dict[str, Any] = Depe
     client_ip = get_remote_address(request)
     username = current_user.get("username", "guest")
     
-    session_key = f"{username}_{client_ip}_{int(time.time() // 3600)}"  # Hour-based session
+    session_key = f"{username}:{client_ip}"
     
-    # Initialize session if not exists
+    # Initialize session if not exists (expired sessions are evicted by the TTL cache)
     if session_key not in session_store:
         session_store[session_key] = {
             "username": username,
             "ip": client_ip,
-            "created_at": time.time(),
             "request_count": 0,
+            "last_seen": time.time(),
             "is_guest": current_user.get("is_guest", True)
         }
     
-    # Update request count
-    session_store[session_key]["request_count"] += 1
-    session_store[session_key]["last_seen"] = time.time()
+    # Record the request; counts are applied in batches by flush_session_updates
+    _pending_requests[session_key] += 1
     
     return session_key
 
+@functools.lru_cache(maxsize=256)
+def _validate_sector_cached(sector: str) -> str:
+    """
+    Validate and clean a sector name (cached, as the same names repeat).
+    
+    Raises:
+        ValueError: If sector name is invalid
+    """
+    if not sector:
+        raise ValueError("Sector name cannot be empty")
+    
+    # Clean the sector name
+    cleaned_sector = sector.strip().lower()
+    
+    # Check length and characters in one pass; work out the specific error only on failure
+    if not _SECTOR_RE.match(cleaned_sector):
+        if len(cleaned_sector) < 2:
+            raise ValueError("Sector name must be at least 2 characters long")
+        if len(cleaned_sector) > 50:
+            raise ValueError("Sector name must be less than 50 characters")
+        raise ValueError("Sector name contains invalid characters. Use only letters, numbers, spaces, hyphens, and underscores.")
+    
+    return cleaned_sector
+
 def validate_sector_name(sector: str) -> str:
     """
     Validate and sanitize sector name input.
@@ -125,78 +241,51 @@ def validate_sector_name(sector: str) -> str:
     Raises:
         HTTPException: If sector name is invalid
     """
-    if not sector:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Sector name cannot be empty"
-        )
-    
-    # Clean the sector name
-    cleaned_sector = sector.strip().lower()
-    
-    # Check length
-    if len(cleaned_sector) < 2:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Sector name must be at least 2 characters long"
-        )
-    
-    if len(cleaned_sector) > 50:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Sector name must be less than 50 characters"
-        )
-    
-    # Check for valid characters (letters, numbers, spaces, hyphens, underscores)
-    import re
-    if not re.match(r'^[a-zA-Z0-9\s\-_]+$', cleaned_sector):
+    try:
+        cleaned_sector = _validate_sector_cached(sector)
+    except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Sector name contains invalid characters. Use only letters, numbers, spaces, hyphens, and underscores."
+            detail=str(e)
         )
     
-    # List of valid sectors (you can expand this)
-    valid_sectors = [
-        "pharmaceuticals", "technology", "agriculture", "automotive", "banking", 
-        "healthcare", "energy", "telecommunications", "retail", "manufacturing",
-        "textiles", "chemicals", "steel", "cement", "real estate", "education",
-        "hospitality", "logistics", "aviation", "railways", "defense", "space",
-        "renewable energy", "fintech", "biotech", "mining", "oil gas", "food processing"
-    ]
-    
     # Allow any sector but log unknown ones
-    if cleaned_sector not in valid_sectors:
+    if cleaned_sector not in _VALID_SECTORS:
         logger.info(f"Unknown sector requested: {cleaned_sector}")
     
     return cleaned_sector
 
-def cleanup_old_sessions():
-    """Clean up old session data (call periodically)."""
-    current_time = time.time()
-    expired_sessions = []
+def flush_session_updates():
+    """Apply pending request counts to the session store (called periodically)."""
+    global _pending_requests
+    pending, _pending_requests = _pending_requests, Counter()
     
-    for session_key, session_data in session_store.items():
-        # Remove sessions older than 24 hours
-        if current_time - session_data.get("created_at", 0) > 86400:
-            expired_sessions.append(session_key)
-    
-    for session_key in expired_sessions:
-        del session_store[session_key]
+    now = time.time()
+    for session_key, request_count in pending.items():
+        session = session_store.get(session_key)
+        if session is None:
+            continue
+        session["request_count"] += request_count
+        session["last_seen"] = now
+        
+        # Re-insert to refresh the session TTL
+        session_store[session_key] = session
+
+def cleanup_old_sessions():
+    """Evict expired session data (called periodically by the background sweeper)."""
+    expired_sessions = session_store.expire()
     
     if expired_sessions:
         logger.info(f"Cleaned up {len(expired_sessions)} expired sessions")
 
 def get_session_stats() -> Dict[str, Any]:
     """Get session statistics."""
-    cleanup_old_sessions()  # Clean up before getting stats
-    
-    total_sessions = len(session_store)
-    guest_sessions = sum(1 for s in session_store.values() if s.get("is_guest", True))
-    authenticated_sessions = total_sessions - guest_sessions
-    
     return {
-        "total_sessions": total_sessions,
-        "guest_sessions": guest_sessions,
-        "authenticated_sessions": authenticated_sessions,
-        "session_keys": list(session_store.keys())
-    }
\ No newline at end of file
+        "total_sessions": len(session_store),
+        "guest_sessions": session_store.guest_count,
+        "authenticated_sessions": session_store.auth_count
+    }
+
+def list_session_keys(offset: int = 0, limit: int = 100) -> List[str]:
+    """List a page of session keys (for admin/debugging use)."""
+    return list(islice(session_store, offset, offset + limit))
\ No newline at end of file
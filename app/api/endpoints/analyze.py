@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import StreamingResponse
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from typing import Dict, Any
@@ -55,6 +55,16 @@ async def analyze_sector(
         
         logger.info(f"Analyzing sector '{clean_sector}' for user '{current_user.get('username', 'unknown')}' (session: {user_session[:10]}...)")
         
+        user_type = "guest" if current_user.get("is_guest") else "authenticated"
+        
+        # Stream markdown format if requested
+        if format.lower() == "markdown":
+            return StreamingResponse(
+                analysis_service.stream_sector_analysis(clean_sector, user_session),
+                media_type="text/markdown",
+                headers={"X-User-Type": user_type}
+            )
+        
         # Perform analysis
         analysis_result = await analysis_service.analyze_sector(clean_sector, user_session)
         
@@ -67,14 +77,7 @@ async def analyze_sector(
         
         # Set response headers
         response.headers["X-Analysis-Status"] = analysis_result.get("status", "unknown")
-        response.headers["X-User-Type"] = "guest" if current_user.get("is_guest") else "authenticated"
-        
-        # Return markdown format if requested
-        if format.lower() == "markdown":
-            return PlainTextResponse(
-                content=analysis_result.get("analysis", "No analysis available"),
-                media_type="text/markdown"
-            )
+        response.headers["X-User-Type"] = user_type
         
         # Return JSON format by default
         return analysis_result
@@ -82,4 +85,8 @@ async def analyze_sector(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error analyzing sector '{sector}': {str(
\ No newline at end of file
+        logger.error(f"Unexpected error analyzing sector '{sector}': {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An unexpected error occurred while analyzing the sector"
+        )
@@ -15,13 +15,24 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-super-secret-key-change-this-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    TOKEN_CACHE_MAX_SIZE: int = 10_000
+    TOKEN_CACHE_TTL: int = 30  # seconds
     
     # AI Service
     GEMINI_API_KEY: Optional[str] = None
+    SECTOR_CACHE_MAX_SIZE: int = 512
+    SECTOR_CACHE_TTL: int = 1800  # seconds
     
     # Rate Limiting
     RATE_LIMIT_REQUESTS: int = 10
     RATE_LIMIT_WINDOW: int = 60  # seconds
+    REDIS_URL: Optional[str] = None  # e.g. redis://localhost:6379/0; in-memory if unset
+    
+    # Sessions
+    SESSION_MAX_SIZE: int = 100_000
+    SESSION_TTL: int = 86400  # seconds
+    SESSION_SWEEP_INTERVAL: int = 300  # seconds
+    SESSION_FLUSH_INTERVAL: int = 5  # seconds
     
     # Logging
     LOG_LEVEL: str = "INFO"
@@ -0,0 +1,56 @@
+import asyncio
+import logging
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from slowapi.errors import RateLimitExceeded
+from slowapi import _rate_limit_exceeded_handler
+from app.api.endpoints import analyze
+from app.api.dependencies import get_rate_limiter, cleanup_old_sessions, flush_session_updates
+from app.services.analysis import close_http_client
+from app.config import settings
+
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+app = FastAPI(
+    title=settings.API_TITLE,
+    version=settings.API_VERSION,
+    description=settings.API_DESCRIPTION,
+    debug=settings.DEBUG,
+    default_response_class=ORJSONResponse
+)
+
+# Rate limiting
+app.state.limiter = get_rate_limiter()
+app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+# Routes
+app.include_router(analyze.router)
+
+async def _run_periodically(interval: float, task, name: str):
+    """Run a session maintenance task every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            task()
+        except Exception as e:
+            logger.error(f"{name} failed: {str(e)}")
+
+@app.on_event("startup")
+async def start_session_tasks():
+    """Start the background session flusher and sweeper."""
+    app.state.session_tasks = [
+        asyncio.create_task(_run_periodically(settings.SESSION_FLUSH_INTERVAL, flush_session_updates, "Session flush")),
+        asyncio.create_task(_run_periodically(settings.SESSION_SWEEP_INTERVAL, cleanup_old_sessions, "Session sweep"))
+    ]
+
+@app.on_event("shutdown")
+async def stop_session_tasks():
+    """Stop the background session tasks."""
+    for task in app.state.session_tasks:
+        task.cancel()
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    """Close the shared HTTP client."""
+    await close_http_client()
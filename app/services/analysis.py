@@ -1,18 +1,39 @@
 import asyncio
+import warnings
+from datetime import datetime, timezone
+from itertools import islice
 import httpx
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, AsyncIterator
 from duckduckgo_search import DDGS
+from cachetools import TTLCache
 import logging
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 from app.services.gemini import GeminiService
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of bytes read from a fetched page before parsing
+_MAX_FETCH_BYTES = 64 * 1024
+
+# Shared HTTP client so fetches reuse pooled (HTTP/2) connections
+_http_client = httpx.AsyncClient(
+    timeout=10.0,
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+    http2=True
+)
+
+async def close_http_client():
+    """Close the shared HTTP client (call on application shutdown)."""
+    await _http_client.aclose()
+
 class MarketAnalysisService:
     def __init__(self):
         self.gemini_service = GeminiService()
-        self.session_cache = {}  # In-memory cache for session data
+        # Analyses are shared across users, so cache them per sector
+        self.sector_cache = TTLCache(maxsize=settings.SECTOR_CACHE_MAX_SIZE, ttl=settings.SECTOR_CACHE_TTL)
+        # In-flight analyses, so concurrent requests for a sector share one result
+        self._sector_tasks: Dict[str, asyncio.Task] = {}
     
     async def analyze_sector(self, sector: str, user_session: str) -> Dict[str, Any]:
         """
@@ -20,48 +41,120 @@ class MarketAnalysisService:
         
         Args:
             sector: The sector name to analyze
-            user_session: User session identifier for caching
+            user_session: User session identifier (used for logging)
             
         Returns:
             Dictionary containing the analysis report
         """
         try:
             # Check cache first
-            cache_key = f"{user_session}_{sector}"
-            if cache_key in self.session_cache:
-                logger.info(f"Returning cached analysis for {sector}")
-                return self.session_cache[cache_key]
-            
-            # Collect market data
-            market_data = await self._collect_market_data(sector)
-            
-            # Generate AI analysis
-            analysis_report = await self.gemini_service.analyze_sector_data(sector, market_data)
+            cache_key = sector.lower()
+            cached_result = self.sector_cache.get(cache_key)
+            if cached_result is not None:
+                logger.info(f"Returning cached analysis for {sector} (session: {user_session[:10]}...)")
+                return dict(cached_result)
             
-            # Prepare response
-            result = {
-                "sector": sector,
-                "analysis": analysis_report,
-                "data_sources": market_data.get("sources", []),
-                "generated_at": self._get_current_timestamp(),
-                "status": "success"
-            }
+            # Join the in-flight analysis for this sector, or start one
+            task = self._sector_tasks.get(cache_key)
+            if task is None:
+                task = asyncio.create_task(self._run_sector_analysis(sector, cache_key))
+                self._sector_tasks[cache_key] = task
+                task.add_done_callback(lambda done: self._drop_sector_task(cache_key, done))
+            else:
+                logger.info(f"Joining in-flight analysis for {sector} (session: {user_session[:10]}...)")
             
-            # Cache the result (simple in-memory cache)
-            self.session_cache[cache_key] = result
-            
-            return result
+            # Shield the shared task so one cancelled request doesn't cancel it for the others
+            result = await asyncio.shield(task)
+            return dict(result)
             
         except Exception as e:
             logger.error(f"Error analyzing sector {sector}: {str(e)}")
             return {
                 "sector": sector,
-                "analysis": f"# Error Analyzing {sector.title()} Sector\n\nWe encountered an error while analyzing this sector. Please try again later.",
+                "analysis": self._error_report(sector),
                 "error": str(e),
                 "status": "error",
                 "generated_at": self._get_current_timestamp()
             }
     
+    async def _run_sector_analysis(self, sector: str, cache_key: str) -> Dict[str, Any]:
+        """Run the full analysis pipeline for a sector and cache the result."""
+        # Collect market data
+        market_data = await self._collect_market_data(sector)
+        
+        # Generate AI analysis
+        analysis_report, is_fallback = await self.gemini_service.analyze_sector_data(sector, market_data)
+        
+        # Prepare response
+        result = {
+            "sector": sector,
+            "analysis": analysis_report,
+            "data_sources": market_data.get("sources", []),
+            "generated_at": self._get_current_timestamp(),
+            "status": "success"
+        }
+        
+        # Cache the result for all users; a fallback report only goes to requests already waiting
+        if is_fallback:
+            logger.warning(f"Not caching fallback analysis for {sector}")
+        else:
+            self.sector_cache[cache_key] = result
+        
+        return result
+    
+    def _drop_sector_task(self, cache_key: str, task: asyncio.Task):
+        """Forget a finished sector analysis so later requests start a new one."""
+        if self._sector_tasks.get(cache_key) is task:
+            del self._sector_tasks[cache_key]
+    
+    async def stream_sector_analysis(self, sector: str, user_session: str) -> AsyncIterator[str]:
+        """
+        Stream the markdown analysis report for a sector as it is generated.
+        
+        Args:
+            sector: The sector name to analyze
+            user_session: User session identifier (used for logging)
+            
+        Yields:
+            Chunks of the markdown analysis report
+        """
+        cache_key = sector.lower()
+        cached_result = self.sector_cache.get(cache_key)
+        if cached_result is not None:
+            logger.info(f"Returning cached analysis for {sector} (session: {user_session[:10]}...)")
+            yield cached_result["analysis"]
+            return
+        
+        chunks = []
+        is_fallback = False
+        try:
+            # Collect market data
+            market_data = await self._collect_market_data(sector)
+            
+            # Forward the AI analysis as it arrives
+            async for chunk, is_fallback in self.gemini_service.analyze_sector_data_stream(sector, market_data):
+                chunks.append(chunk)
+                yield chunk
+                
+        except Exception as e:
+            logger.error(f"Error streaming analysis for sector {sector}: {str(e)}")
+            # End a partial report with a visible note rather than cutting it off
+            yield self._stream_error_note() if chunks else self._error_report(sector)
+            return
+        
+        # Cache only complete Gemini reports so later requests (JSON or markdown) reuse them
+        if is_fallback:
+            logger.warning(f"Not caching fallback analysis for {sector}")
+            return
+        
+        self.sector_cache[cache_key] = {
+            "sector": sector,
+            "analysis": "".join(chunks),
+            "data_sources": market_data.get("sources", []),
+            "generated_at": self._get_current_timestamp(),
+            "status": "success"
+        }
+    
     async def _collect_market_data(self, sector: str) -> Dict[str, Any]:
         """
         Collect market data from various sources.
@@ -107,48 +200,42 @@ class MarketAnalysisService:
             List of news items
         """
         try:
-            # Create search queries
-            queries = [
-                f"{sector} sector India market news 2024",
-                f"{sector} industry India opportunities",
-                f"Indian {sector} market trends investment"
-            ]
+            # A single broad query; narrower overlapping queries mostly returned the same results
+            query = f"{sector} India market trends opportunities 2024"
+            
+            # Run the blocking DuckDuckGo search on a worker thread
+            results = await asyncio.to_thread(self._run_search_query, query, 10)
             
             news_items = []
+            seen_titles = set()
             
-            for query in queries:
-                try:
-                    # Use DuckDuckGo search
-                    with DDGS() as ddgs:
-                        results = list(ddgs.text(query, max_results=3))
-                        
-                        for result in results:
-                            news_item = {
-                                "title": result.get("title", ""),
-                                "snippet": result.get("body", ""),
-                                "url": result.get("href", ""),
-                                "source": "DuckDuckGo"
-                            }
-                            news_items.append(news_item)
-                            
-                except Exception as e:
-                    logger.error(f"Error searching with query '{query}': {str(e)}")
+            for result in results:
+                # Skip duplicates based on normalized title
+                title = result.get("title") or ""
+                title_key = " ".join(title.split()).lower()
+                if not title_key or title_key in seen_titles:
                     continue
+                seen_titles.add(title_key)
+                
+                news_items.append({
+                    "title": title,
+                    "snippet": result.get("body", ""),
+                    "url": result.get("href", ""),
+                    "source": "DuckDuckGo"
+                })
             
-            # Remove duplicates based on title
-            seen_titles = set()
-            unique_news = []
-            for item in news_items:
-                if item["title"] not in seen_titles:
-                    seen_titles.add(item["title"])
-                    unique_news.append(item)
-            
-            return unique_news[:10]  # Return top 10 unique results
+            return news_items
             
         except Exception as e:
             logger.error(f"Error in news search: {str(e)}")
             return []
     
+    @staticmethod
+    def _run_search_query(query: str, max_results: int) -> List[Dict[str, Any]]:
+        """Run a single (blocking) DuckDuckGo text search."""
+        with DDGS() as ddgs:
+            return list(ddgs.text(query, max_results=max_results))
+    
     async def _fetch_url_content(self, url: str) -> Optional[str]:
         """
         Fetch content from a URL (for additional data collection).
@@ -160,42 +247,74 @@ class MarketAnalysisService:
             Text content of the page or None if failed
         """
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(url)
+            async with _http_client.stream("GET", url) as response:
                 response.raise_for_status()
                 
-                # Parse HTML content
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Extract text content (basic extraction)
-                text = soup.get_text()
-                
-                # Clean up the text
-                lines = (line.strip() for line in text.splitlines())
-                chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                text = ' '.join(chunk for chunk in chunks if chunk)
-                
-                return text[:2000]  # Limit content length
+                # Only read as much of the body as we need
+                chunks = []
+                total = 0
+                async for chunk in response.aiter_bytes(16384):
+                    chunks.append(chunk)
+                    total += len(chunk)
+                    if total >= _MAX_FETCH_BYTES:
+                        break
                 
+                html = b"".join(chunks).decode(response.charset_encoding or "utf-8", "replace")
+            
+            # Parse HTML content
+            tree = LexborHTMLParser(html)
+            tree.strip_tags(["script", "style"])
+            
+            # Extract text content (basic extraction)
+            text = tree.body.text(separator=" ", strip=True) if tree.body else ""
+            
+            # Collapse whitespace
+            text = " ".join(text.split())
+            
+            return text[:2000]  # Limit content length
+            
         except Exception as e:
             logger.error(f"Error fetching URL {url}: {str(e)}")
             return None
     
+    def _error_report(self, sector: str) -> str:
+        """Get the markdown report shown when a sector analysis fails."""
+        return f"# Error Analyzing {sector.title()} Sector\n\nWe encountered an error while analyzing this sector. Please try again later."
+    
+    def _stream_error_note(self) -> str:
+        """Get the note appended when a streamed report fails part-way through."""
+        return "\n\n---\n\n*This report is incomplete: we encountered an error while generating it. Please try again later.*\n"
+    
     def _get_current_timestamp(self) -> str:
-        """Get current timestamp as string."""
-        from datetime import datetime
-        return datetime.now().isoformat()
+        """Get current UTC timestamp as string."""
+        return datetime.now(timezone.utc).isoformat(timespec="seconds")
     
     def clear_user_cache(self, user_session: str):
-        """Clear cache for a specific user session."""
-        keys_to_remove = [key for key in self.session_cache.keys() if key.startswith(user_session)]
-        for key in keys_to_remove:
-            del self.session_cache[key]
-        logger.info(f"Cleared cache for user session: {user_session}")
+        """
+        Deprecated: analyses are cached per sector and shared across sessions.
+        
+        Use clear_sector_cache() instead.
+        """
+        warnings.warn(
+            "clear_user_cache is deprecated; the analysis cache is shared across sessions",
+            DeprecationWarning,
+            stacklevel=2
+        )
+    
+    def clear_sector_cache(self, sector: Optional[str] = None):
+        """Clear cached analysis for one sector, or for all sectors."""
+        if sector is None:
+            self.sector_cache.clear()
+        else:
+            self.sector_cache.pop(sector.lower(), None)
+        logger.info(f"Cleared sector cache: {sector or 'all sectors'}")
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
         return {
-            "cached_items": len(self.session_cache),
-            "cache_keys": list(self.session_cache.keys())
-        }
\ No newline at end of file
+            "cached_items": len(self.sector_cache)
+        }
+    
+    def list_cache_keys(self, offset: int = 0, limit: int = 100) -> List[str]:
+        """List a page of cached sector keys."""
+        return list(islice(self.sector_cache, offset, offset + limit))
\ No newline at end of file
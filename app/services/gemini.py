@@ -1,10 +1,58 @@
 import google.generativeai as genai
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator, Tuple
 import logging
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Static analysis prompt, formatted per request with the sector and news summary
+_PROMPT_TEMPLATE = """\
+As a market analyst specializing in Indian markets, analyze the {sector} sector and provide trade opportunities.
+
+Current Market Information:
+{news_summary}
+
+Please provide a comprehensive markdown analysis report with the following structure:
+
+# {sector_title} Sector Analysis Report
+
+## Executive Summary
+Provide a 2-3 sentence overview of the current state and opportunities.
+
+## Market Overview
+- Current market size and growth trends
+- Key players and market dynamics
+- Recent developments affecting the sector
+
+## Trade Opportunities
+### Short-term Opportunities (1-3 months)
+- List 3-5 specific opportunities with brief explanations
+
+### Medium-term Opportunities (3-12 months)  
+- List 3-5 opportunities with market drivers
+
+### Long-term Opportunities (1-3 years)
+- List 2-3 strategic opportunities
+
+## Risk Analysis
+- Key risks and challenges
+- Mitigation strategies
+
+## Investment Recommendations
+- Recommended investment strategies
+- Entry and exit points to consider
+
+## Key Metrics to Monitor
+- Important indicators to track
+- Regulatory changes to watch
+
+## Conclusion
+Summary of key takeaways and next steps.
+
+Focus on Indian market context, current economic conditions, and provide actionable insights.
+Make sure all recommendations are based on the provided market data and current trends.
+"""
+
 class GeminiService:
     def __init__(self):
         if settings.GEMINI_API_KEY:
@@ -14,7 +62,7 @@ class GeminiService:
             logger.warning("Gemini API key not configured")
             self.model = None
     
-    async def analyze_sector_data(self, sector: str, market_data: Dict[str, Any]) -> str:
+    async def analyze_sector_data(self, sector: str, market_data: Dict[str, Any]) -> Tuple[str, bool]:
         """
         Analyze sector data using Gemini AI and generate insights.
         
@@ -23,27 +71,68 @@ class GeminiService:
             market_data: Dictionary containing market information
             
         Returns:
-            Structured markdown analysis report
+            Tuple of the structured markdown analysis report and whether it is
+            the generic fallback report (Gemini unavailable, failed or empty)
         """
         if not self.model:
-            return self._generate_fallback_analysis(sector, market_data)
+            return self._generate_fallback_analysis(sector, market_data), True
         
         try:
             # Prepare the prompt for Gemini
             prompt = self._create_analysis_prompt(sector, market_data)
             
             # Generate analysis using Gemini
-            response = self.model.generate_content(prompt)
+            response = await self.model.generate_content_async(prompt)
             
             if response.text:
-                return response.text
+                return response.text, False
             else:
                 logger.error("Empty response from Gemini API")
-                return self._generate_fallback_analysis(sector, market_data)
+                return self._generate_fallback_analysis(sector, market_data), True
                 
         except Exception as e:
             logger.error(f"Error calling Gemini API: {str(e)}")
-            return self._generate_fallback_analysis(sector, market_data)
+            return self._generate_fallback_analysis(sector, market_data), True
+    
+    async def analyze_sector_data_stream(self, sector: str, market_data: Dict[str, Any]) -> AsyncIterator[Tuple[str, bool]]:
+        """
+        Stream the sector analysis from Gemini AI as it is generated.
+        
+        Falls back to the generic report if Gemini is unavailable or fails
+        before sending anything. Once output has started a failure can't be
+        hidden behind the fallback, so the error is re-raised.
+        
+        Args:
+            sector: The sector name to analyze
+            market_data: Dictionary containing market information
+            
+        Yields:
+            Tuples of a markdown report chunk and whether it is the fallback report
+        """
+        if not self.model:
+            yield self._generate_fallback_analysis(sector, market_data), True
+            return
+        
+        has_output = False
+        try:
+            # Prepare the prompt for Gemini
+            prompt = self._create_analysis_prompt(sector, market_data)
+            
+            # Forward chunks as Gemini generates them
+            response = await self.model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                if chunk.text:
+                    has_output = True
+                    yield chunk.text, False
+                    
+        except Exception as e:
+            logger.error(f"Error streaming from Gemini API: {str(e)}")
+            if has_output:
+                raise
+        
+        if not has_output:
+            logger.error("Empty response from Gemini API")
+            yield self._generate_fallback_analysis(sector, market_data), True
     
     def _create_analysis_prompt(self, sector: str, market_data: Dict[str, Any]) -> str:
         """Create a structured prompt for Gemini analysis."""
@@ -53,54 +142,11 @@ class GeminiService:
             for item in market_data.get('news', [])[:5]
         ])
         
-        prompt = f"""
-        As a market analyst specializing in Indian markets, analyze the {sector} sector and provide trade opportunities.
-        
-        Current Market Information:
-        {news_summary}
-        
-        Please provide a comprehensive markdown analysis report with the following structure:
-        
-        # {sector.title()} Sector Analysis Report
-        
-        ## Executive Summary
-        Provide a 2-3 sentence overview of the current state and opportunities.
-        
-        ## Market Overview
-        - Current market size and growth trends
-        - Key players and market dynamics
-        - Recent developments affecting the sector
-        
-        ## Trade Opportunities
-        ### Short-term Opportunities (1-3 months)
-        - List 3-5 specific opportunities with brief explanations
-        
-        ### Medium-term Opportunities (3-12 months)  
-        - List 3-5 opportunities with market drivers
-        
-        ### Long-term Opportunities (1-3 years)
-        - List 2-3 strategic opportunities
-        
-        ## Risk Analysis
-        - Key risks and challenges
-        - Mitigation strategies
-        
-        ## Investment Recommendations
-        - Recommended investment strategies
-        - Entry and exit points to consider
-        
-        ## Key Metrics to Monitor
-        - Important indicators to track
-        - Regulatory changes to watch
-        
-        ## Conclusion
-        Summary of key takeaways and next steps.
-        
-        Focus on Indian market context, current economic conditions, and provide actionable insights.
-        Make sure all recommendations are based on the provided market data and current trends.
-        """
-        
-        return prompt
+        return _PROMPT_TEMPLATE.format(
+            sector=sector,
+            sector_title=sector.title(),
+            news_summary=news_summary
+        )
     
     def _generate_fallback_analysis(self, sector: str, market_data: Dict[str, Any]) -> str:
         """Generate a basic analysis when Gemini API is not available."""
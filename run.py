@@ -58,14 +58,35 @@ def run_server():
     print("🛑 Press Ctrl+C to stop the server")
     print("-" * 50)
     
-    try:
-        subprocess.run([
+    from app.config import settings
+    
+    if settings.DEBUG:
+        # Single process with auto-reload for development
+        command = [
             sys.executable, "-m", "uvicorn", 
             "app.main:app", 
             "--reload", 
             "--host", "0.0.0.0", 
             "--port", "8000"
-        ])
+        ]
+    else:
+        # Multiple uvicorn workers under gunicorn for production
+        command = [
+            sys.executable, "-m", "gunicorn",
+            "app.main:app",
+            "-k", "uvicorn.workers.UvicornWorker",
+            "-w", str(os.cpu_count() or 1),
+            "-b", "0.0.0.0:8000",
+            # Recycle workers periodically to contain memory growth
+            "--max-requests", "1000",
+            "--max-requests-jitter", "100"
+        ]
+        # Keep worker heartbeat files in memory where available
+        if Path("/dev/shm").is_dir():
+            command += ["--worker-tmp-dir", "/dev/shm"]
+    
+    try:
+        subprocess.run(command)
     except KeyboardInterrupt:
         print("\n👋 Server stopped by user")
     except Exception as e:
@@ -0,0 +1,71 @@
+import time
+from app.api import dependencies
+from app.api.dependencies import SessionStore
+
+
+def _session(is_guest: bool):
+    return {"username": "guest" if is_guest else "demo", "request_count": 0, "is_guest": is_guest}
+
+
+def test_session_counts_track_inserts():
+    store = SessionStore(maxsize=10, ttl=60)
+
+    store["guest:1.1.1.1"] = _session(is_guest=True)
+    store["demo:1.1.1.1"] = _session(is_guest=False)
+
+    assert (store.guest_count, store.auth_count) == (1, 1)
+
+
+def test_session_counts_ignore_reinserts():
+    store = SessionStore(maxsize=10, ttl=60)
+
+    store["guest:1.1.1.1"] = _session(is_guest=True)
+    store["guest:1.1.1.1"] = _session(is_guest=True)
+
+    assert len(store) == 1
+    assert (store.guest_count, store.auth_count) == (1, 0)
+
+
+def test_session_counts_track_maxsize_eviction():
+    store = SessionStore(maxsize=2, ttl=60)
+
+    store["demo:1.1.1.1"] = _session(is_guest=False)
+    store["guest:1.1.1.1"] = _session(is_guest=True)
+    store["guest:2.2.2.2"] = _session(is_guest=True)
+
+    assert len(store) == 2
+    assert "demo:1.1.1.1" not in store
+    assert (store.guest_count, store.auth_count) == (2, 0)
+
+
+def test_session_counts_track_ttl_expiry():
+    store = SessionStore(maxsize=10, ttl=60)
+    store["guest:1.1.1.1"] = _session(is_guest=True)
+    store["demo:1.1.1.1"] = _session(is_guest=False)
+
+    expired = store.expire(time.monotonic() + 120)
+
+    assert sorted(key for key, _ in expired) == ["demo:1.1.1.1", "guest:1.1.1.1"]
+    assert len(store) == 0
+    assert (store.guest_count, store.auth_count) == (0, 0)
+
+
+def test_session_counts_track_delete():
+    store = SessionStore(maxsize=10, ttl=60)
+    store["demo:1.1.1.1"] = _session(is_guest=False)
+
+    del store["demo:1.1.1.1"]
+
+    assert (store.guest_count, store.auth_count) == (0, 0)
+
+
+def test_cleanup_old_sessions_evicts_expired(monkeypatch):
+    store = SessionStore(maxsize=10, ttl=0.01)
+    store["guest:1.1.1.1"] = _session(is_guest=True)
+    monkeypatch.setattr(dependencies, "session_store", store)
+
+    time.sleep(0.02)
+    dependencies.cleanup_old_sessions()
+
+    assert len(store) == 0
+    assert dependencies.get_session_stats()["guest_sessions"] == 0
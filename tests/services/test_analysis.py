@@ -0,0 +1,185 @@
+import asyncio
+import pytest
+from app.services.analysis import MarketAnalysisService
+
+
+class GatedGemini:
+    """Fake Gemini service that waits on a gate, then returns a fallback report or fails."""
+
+    def __init__(self, error: Exception = None):
+        self.gate = asyncio.Event()
+        self.error = error
+        self.calls = 0
+
+    async def analyze_sector_data(self, sector, market_data):
+        self.calls += 1
+        await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        return "# Generic fallback", True
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = MarketAnalysisService()
+
+    async def collect_market_data(sector):
+        return {"news": [], "sources": [], "sector": sector}
+
+    monkeypatch.setattr(service, "_collect_market_data", collect_market_data)
+    return service
+
+
+async def _run_pending_tasks():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_requests_share_one_fallback_analysis(service):
+    async def run():
+        gemini = GatedGemini()
+        service.gemini_service = gemini
+
+        requests = [
+            asyncio.create_task(service.analyze_sector("steel", f"session-{n}"))
+            for n in range(3)
+        ]
+        await _run_pending_tasks()
+        gemini.gate.set()
+        results = await asyncio.gather(*requests)
+
+        assert gemini.calls == 1
+        assert [result["analysis"] for result in results] == ["# Generic fallback"] * 3
+        assert "steel" not in service.sector_cache
+        assert not service._sector_tasks
+
+        # The fallback isn't cached, so a later request runs a new analysis
+        await service.analyze_sector("steel", "session-later")
+        assert gemini.calls == 2
+
+    asyncio.run(run())
+
+
+def test_concurrent_requests_share_one_failed_analysis(service):
+    async def run():
+        gemini = GatedGemini(error=RuntimeError("Gemini unavailable"))
+        service.gemini_service = gemini
+
+        requests = [
+            asyncio.create_task(service.analyze_sector("steel", f"session-{n}"))
+            for n in range(3)
+        ]
+        await _run_pending_tasks()
+        gemini.gate.set()
+        results = await asyncio.gather(*requests)
+
+        assert gemini.calls == 1
+        assert [result["status"] for result in results] == ["error"] * 3
+        assert not service._sector_tasks
+
+    asyncio.run(run())
+
+
+def test_cancelled_request_does_not_cancel_shared_analysis(service):
+    async def run():
+        gemini = GatedGemini()
+        service.gemini_service = gemini
+
+        first = asyncio.create_task(service.analyze_sector("steel", "session-a"))
+        second = asyncio.create_task(service.analyze_sector("steel", "session-b"))
+        await _run_pending_tasks()
+
+        first.cancel()
+        await _run_pending_tasks()
+        gemini.gate.set()
+
+        result = await second
+        assert result["analysis"] == "# Generic fallback"
+        assert gemini.calls == 1
+
+    asyncio.run(run())
+
+
+class StaticGemini:
+    """Fake Gemini service returning a fixed report."""
+
+    def __init__(self, report: str, is_fallback: bool):
+        self.report = report
+        self.is_fallback = is_fallback
+
+    async def analyze_sector_data(self, sector, market_data):
+        return self.report, self.is_fallback
+
+
+def test_analysis_is_cached_for_all_sessions(service):
+    service.gemini_service = StaticGemini("# Steel report", is_fallback=False)
+
+    result = asyncio.run(service.analyze_sector("steel", "session-a"))
+
+    assert result["analysis"] == "# Steel report"
+    assert service.sector_cache["steel"]["analysis"] == "# Steel report"
+
+
+def test_fallback_analysis_is_not_cached(service):
+    service.gemini_service = StaticGemini("# Generic fallback", is_fallback=True)
+
+    result = asyncio.run(service.analyze_sector("steel", "session-a"))
+
+    assert result["analysis"] == "# Generic fallback"
+    assert "steel" not in service.sector_cache
+
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeStreamingModel:
+    """Fake Gemini model that streams the given chunks, then optionally fails."""
+
+    def __init__(self, chunks, error: Exception = None):
+        self.chunks = chunks
+        self.error = error
+
+    async def generate_content_async(self, prompt, stream=False):
+        async def response():
+            for text in self.chunks:
+                yield FakeChunk(text)
+            if self.error is not None:
+                raise self.error
+        return response()
+
+
+async def _collect_stream(service, sector):
+    return [chunk async for chunk in service.stream_sector_analysis(sector, "session-a")]
+
+
+def test_stream_is_cached_when_complete(service):
+    service.gemini_service.model = FakeStreamingModel(["# Report part 1\n", "## Part 2\n"])
+
+    chunks = asyncio.run(_collect_stream(service, "steel"))
+
+    assert chunks == ["# Report part 1\n", "## Part 2\n"]
+    assert service.sector_cache["steel"]["analysis"] == "# Report part 1\n## Part 2\n"
+
+
+def test_stream_failure_after_output_is_not_cached(service):
+    service.gemini_service.model = FakeStreamingModel(
+        ["# Report part 1\n"], error=RuntimeError("stream dropped")
+    )
+
+    chunks = asyncio.run(_collect_stream(service, "steel"))
+
+    assert chunks[0] == "# Report part 1\n"
+    assert chunks[1] == service._stream_error_note()
+    assert "steel" not in service.sector_cache
+
+
+def test_stream_fallback_is_not_cached(service):
+    service.gemini_service.model = FakeStreamingModel([], error=RuntimeError("unavailable"))
+
+    chunks = asyncio.run(_collect_stream(service, "steel"))
+
+    assert len(chunks) == 1
+    assert chunks[0].startswith("# Steel Sector Analysis Report")
+    assert "steel" not in service.sector_cache